@@ -0,0 +1,178 @@
+"""Markdown formatter for the synced WeCom docs.
+
+Kept free of I/O and third-party imports so it can be compiled with mypyc
+(``mypyc _formatter.py``); the resulting extension module shadows this file
+on import and the pure-Python version is used otherwise. After editing this
+file, rebuild or delete ``_formatter*.so``; a stale build keeps running the
+old rules.
+"""
+
+from __future__ import annotations
+
+from typing import Final, FrozenSet, List, Optional
+
+LIST_MARKERS: Final[FrozenSet[str]] = frozenset("-+*")
+TABLE_SEPARATOR_CHARS: Final = "|:- "
+
+
+def normalize_heading_line(line: str, stripped: str) -> str:
+    """Normalize heading line spacing and extra hashes.
+
+    Args:
+        line: Heading line; its first non-whitespace character is #.
+        stripped: The same line without leading whitespace, as already
+            computed by the caller.
+
+    Returns:
+        Normalized heading line without trailing whitespace.
+    """
+
+    indent = line[: len(line) - len(stripped)]
+    rest = stripped.lstrip("#")
+    hashes = stripped[: len(stripped) - len(rest)]
+    rest = rest.lstrip().lstrip("#").strip()
+    if rest:
+        return f"{indent}{hashes} {rest}"
+    return f"{indent}{hashes}"
+
+
+def is_list_item(stripped: str) -> bool:
+    """Return True if the left-stripped line looks like a list item."""
+
+    first = stripped[:1]
+    if not first:
+        return False
+    if first in LIST_MARKERS:
+        return stripped[1:2].isspace()
+    if not first.isdecimal():
+        return False
+
+    # Numbered item: digits, a dot, then whitespace.
+    idx = 1
+    while stripped[idx : idx + 1].isdecimal():
+        idx += 1
+    return stripped[idx : idx + 1] == "." and stripped[idx + 1 : idx + 2].isspace()
+
+
+def is_table_separator(line: str) -> bool:
+    """Return True if the line looks like a markdown table separator."""
+
+    s = line.strip()
+    if not s or "|" not in s or "-" not in s:
+        return False
+    # Stripping the allowed characters empties the line iff it has no others.
+    return not s.strip(TABLE_SEPARATOR_CHARS)
+
+
+def format_markdown(content: str) -> str:
+    """Format markdown using the SKILL.md rules.
+
+    Each line is classified once from its left-stripped form; the fence,
+    heading, list and table checks all reuse that instead of re-scanning.
+    Blank lines leave the loop early and the list check only runs for lines
+    whose first character can open a list item.
+
+    Args:
+        content: Raw markdown content.
+
+    Returns:
+        Formatted markdown content.
+    """
+
+    # splitlines() treats \r\n and a lone \r as line breaks too, so no line
+    # keeps a trailing \r and CRLF input needs no per-line cleanup.
+    lines = content.splitlines()
+    # Trailing sentinel so every line can be zipped with its successor.
+    lines.append("")
+    out: List[str] = []
+    last_blank = True
+    in_fence = False
+    in_table = False
+    pending_blank_after_heading = False
+    pending_blank_after_fence = False
+    prev_block: Optional[str] = None
+
+    for line, next_line in zip(lines, lines[1:]):
+        stripped = line.lstrip()
+        is_blank = not stripped
+
+        if stripped.startswith(("```", "~~~")):
+            if not in_fence and not last_blank:
+                out.append("")
+            out.append(line.rstrip())
+            last_blank = False
+            in_fence = not in_fence
+            if not in_fence:
+                pending_blank_after_fence = True
+            prev_block = "fence"
+            continue
+
+        if in_fence:
+            out.append(line)
+            last_blank = is_blank
+            continue
+
+        if is_blank:
+            # Blank lines only close a table and clear the pending separators.
+            if in_table:
+                in_table = False
+                prev_block = None
+            pending_blank_after_fence = False
+            pending_blank_after_heading = False
+            out.append("")
+            last_blank = True
+            continue
+
+        if pending_blank_after_fence:
+            out.append("")
+            last_blank = True
+            pending_blank_after_fence = False
+
+        has_pipe = "|" in line
+        if in_table and not has_pipe:
+            if not last_blank:
+                out.append("")
+                last_blank = True
+            in_table = False
+            prev_block = None
+
+        first = stripped[0]
+        if first == "#":
+            out.append(normalize_heading_line(line, stripped))
+            last_blank = False
+            pending_blank_after_heading = True
+            prev_block = "heading"
+            continue
+
+        if pending_blank_after_heading:
+            out.append("")
+            last_blank = True
+            pending_blank_after_heading = False
+
+        if not in_table and has_pipe and is_table_separator(next_line):
+            if not last_blank:
+                out.append("")
+                last_blank = True
+            in_table = True
+            prev_block = "table"
+
+        # Only lines opening with a marker or a digit can be list items.
+        is_list = (first in LIST_MARKERS or first.isdecimal()) and is_list_item(stripped)
+        if not in_table and not last_blank:
+            if is_list and prev_block == "paragraph":
+                out.append("")
+            elif not is_list and prev_block == "list":
+                out.append("")
+
+        out.append(line.rstrip())
+        last_blank = False
+
+        if in_table or has_pipe:
+            prev_block = "table"
+        elif is_list:
+            prev_block = "list"
+        else:
+            prev_block = "paragraph"
+
+    formatted = "\n".join(out).rstrip() + "\n"
+    return formatted
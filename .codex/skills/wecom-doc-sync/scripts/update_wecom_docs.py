@@ -4,6 +4,9 @@
 from __future__ import annotations
 
 import argparse
+import difflib
+import hashlib
+import io
 import json
 import os
 import re
@@ -11,8 +14,21 @@ import subprocess
 import sys
 import time
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from _formatter import format_markdown
+
+try:
+    import pycurl
+except ImportError:  # Optional: fall back to the curl CLI.
+    pycurl = None
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # Optional: fall back to the stdlib json parser.
+    from json import loads as json_loads
 
 USER_AGENT = (
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -23,11 +39,22 @@ DOC_FETCH_URL = (
     "https://developer.work.weixin.qq.com/docFetch/fetchCnt"
     "?lang=zh_CN&ajax=1&f=json&random="
 )
-FRONTMATTER_RE = re.compile(r"\A---\s*\n(.*?)\n---\s*\n", re.S)
+# Fences are bare `---` lines (CRLF tolerated); the closing one may end the file.
+FRONTMATTER_RE = re.compile(r"\A---[ \t]*\r?\n([\s\S]*?)\r?\n---[ \t]*(?:\r?\n|\Z)")
+FRONTMATTER_FIELD_RE = re.compile(r"^[ \t]*([A-Za-z_][\w-]*)[ \t]*:(.*)$", re.M)
 SOURCE_PATH_ID_RE = re.compile(r"/document/path/(\d+)")
-HEADING_RE = re.compile(r"^(\s*)(#+)(.*)$")
-LIST_RE = re.compile(r"^\s*(?:[-+*]|\d+\.)\s+")
-FENCE_RE = re.compile(r"^\s*(```|~~~)")
+FETCH_CONCURRENCY = 8
+CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache"
+FETCH_CACHE_DIR = CACHE_DIR / "docFetch"
+# Bump whenever format_markdown output changes: docs synced with an older
+# version are reformatted on the next run.
+FORMAT_VERSION = "1"
+
+
+def decode_stderr(raw: bytes) -> str:
+    """Decode captured subprocess stderr for an error message."""
+
+    return raw.decode("utf-8", "replace").strip()
 
 
 def parse_frontmatter(text: str) -> Tuple[Optional[str], Optional[Dict[str, str]], str]:
@@ -50,14 +77,7 @@ def parse_frontmatter(text: str) -> Tuple[Optional[str], Optional[Dict[str, str]
     body = text[match.end() :]
     meta: Dict[str, str] = {}
 
-    for line in fm_content.splitlines():
-        line = line.strip()
-        if not line or line.startswith("#"):
-            continue
-        if ":" not in line:
-            continue
-        key, value = line.split(":", 1)
-        key = key.strip()
+    for key, value in FRONTMATTER_FIELD_RE.findall(fm_content):
         value = value.strip()
         if (
             len(value) >= 2
@@ -70,57 +90,297 @@ def parse_frontmatter(text: str) -> Tuple[Optional[str], Optional[Dict[str, str]
     return fm_raw, meta, body
 
 
-def fetch_doc_payload(
-    doc_id: str,
-    source_url: str,
-    cookie: Optional[str],
-    timeout: int,
-) -> Tuple[Optional[Dict[str, object]], Optional[str]]:
-    """Fetch the raw payload from the docFetch endpoint.
+def set_frontmatter_field(fm_raw: str, key: str, value: str) -> str:
+    """Set a top-level `key: value` line in raw frontmatter.
+
+    Args:
+        fm_raw: Raw frontmatter including both `---` fences.
+        key: Field name.
+        value: Field value, written verbatim.
+
+    Returns:
+        Updated raw frontmatter. An existing field is replaced in place,
+        otherwise the field is appended before the closing fence.
+    """
+
+    field = f"{key}: {value}"
+    # Same leading-whitespace rule as FRONTMATTER_FIELD_RE, so any line that
+    # parse_frontmatter read as key is the one replaced.
+    pattern = re.compile(rf"^[ \t]*{re.escape(key)}[ \t]*:.*$", re.M)
+    updated, count = pattern.subn(lambda _match: field, fm_raw, count=1)
+    if count:
+        return updated
+
+    head, _sep, closing = fm_raw.rstrip().rpartition("\n")
+    return f"{head}\n{field}\n{closing}\n"
+
+
+def remove_frontmatter_field(fm_raw: str, key: str) -> str:
+    """Remove a top-level `key: value` line from raw frontmatter, if present."""
+
+    pattern = re.compile(rf"^[ \t]*{re.escape(key)}[ \t]*:.*\n", re.M)
+    return pattern.sub("", fm_raw, count=1)
+
+
+def doc_fetch_url() -> str:
+    """Return the docFetch endpoint URL with a fresh cache-busting suffix."""
+
+    return DOC_FETCH_URL + str(int(time.time() * 1000))
+
+
+def doc_fetch_headers(source_url: str, last_modified: Optional[str] = None) -> list[str]:
+    """Return the request headers sent with a docFetch POST.
 
     Args:
-        doc_id: Document id to request.
         source_url: Original document URL for the Referer header.
-        cookie: Optional cookie string passed to curl.
-        timeout: Curl timeout in seconds.
+        last_modified: Optional Last-Modified value from the previous sync, sent
+            as If-Modified-Since to make the request conditional.
 
     Returns:
-        A tuple of (payload_dict, error_message). If error occurs, payload_dict is
-        None.
+        Header lines in `name: value` form.
     """
 
-    url = DOC_FETCH_URL + str(int(time.time() * 1000))
-    cmd = [
-        "curl",
-        "-s",
-        "--max-time",
-        str(timeout),
-        url,
-        "-H",
+    headers = [
         "accept: application/json, text/plain, */*",
-        "-H",
         "content-type: application/x-www-form-urlencoded",
-        "-H",
         "origin: https://developer.work.weixin.qq.com",
-        "-H",
         f"referer: {source_url}",
-        "-H",
         f"user-agent: {USER_AGENT}",
-        "--data-raw",
-        f"doc_id={doc_id}",
     ]
-    if cookie:
-        cmd.extend(["-b", cookie])
+    if last_modified:
+        headers.append(f"if-modified-since: {last_modified}")
+    return headers
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        return None, f"curl failed: {result.stderr.strip() or result.returncode}"
+
+def doc_fetch_curl_args(
+    doc_id: str,
+    source_url: str,
+    last_modified: Optional[str] = None,
+) -> list[str]:
+    """Build the curl URL, header and body arguments for one docFetch request.
+
+    Args:
+        doc_id: Document id to request.
+        source_url: Original document URL for the Referer header.
+        last_modified: Optional If-Modified-Since value.
+
+    Returns:
+        Curl arguments describing a single docFetch POST.
+    """
+
+    args = [doc_fetch_url()]
+    for header in doc_fetch_headers(source_url, last_modified):
+        args.extend(["-H", header])
+    args.extend(["--data-raw", f"doc_id={doc_id}"])
+    return args
+
+
+class DocResponse(NamedTuple):
+    """Raw HTTP response returned by docFetch."""
+
+    status: int
+    body: bytes
+    last_modified: Optional[str]
+
+
+def parse_response_head(raw: bytes) -> Tuple[int, Optional[str]]:
+    """Parse the status code and Last-Modified header from raw response headers.
+
+    Args:
+        raw: Header bytes as dumped by curl -D. Only the final response block is
+            considered, so interim 1xx responses are skipped.
+
+    Returns:
+        A tuple of (status_code, last_modified). status_code is 0 if no status
+        line was found.
+    """
+
+    status = 0
+    last_modified: Optional[str] = None
+    for line in raw.decode("latin-1").splitlines():
+        if line.startswith("HTTP/"):
+            parts = line.split()
+            status = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+            last_modified = None
+            continue
+        name, sep, value = line.partition(":")
+        if sep and name.strip().lower() == "last-modified":
+            last_modified = value.strip() or None
+    return status, last_modified
+
+
+class _CurlPool:
+    """Pool of pycurl easy handles driven through one shared CurlMulti.
+
+    Easy handles attached to the same multi handle share its connection cache,
+    so docFetch requests reuse one HTTP/2 connection and TLS session instead of
+    handshaking per document, and run concurrently instead of back to back.
+    """
+
+    def __init__(self) -> None:
+        self._multi = pycurl.CurlMulti()
+        self._multi.setopt(pycurl.M_MAX_HOST_CONNECTIONS, FETCH_CONCURRENCY)
+        self._free: list[pycurl.Curl] = []
+
+    def _checkout(self) -> pycurl.Curl:
+        """Return an idle pooled handle, creating one if none is free."""
+
+        return self._free.pop() if self._free else pycurl.Curl()
+
+    def _release(self, handle: pycurl.Curl) -> None:
+        """Reset handle's options and return it to the pool."""
+
+        handle.reset()
+        self._free.append(handle)
+
+    def _perform(self) -> int:
+        """Drive the multi handle until libcurl stops asking to be called again."""
+
+        while True:
+            ret, active = self._multi.perform()
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                return active
+
+    def _attach(
+        self,
+        request: Tuple[str, list[str], str],
+        cookie: Optional[str],
+        timeout: int,
+    ) -> Tuple[pycurl.Curl, io.BytesIO, io.BytesIO]:
+        """Configure a pooled handle for request and attach it to the multi."""
+
+        url, headers, body = request
+        handle = self._checkout()
+        buffer = io.BytesIO()
+        header_buffer = io.BytesIO()
+        try:
+            handle.setopt(pycurl.URL, url)
+            handle.setopt(pycurl.POSTFIELDS, body)
+            # pycurl only accepts ASCII str values; encode so non-ASCII referers
+            # and cookies go out as UTF-8 bytes like the curl CLI sends them.
+            handle.setopt(
+                pycurl.HTTPHEADER,
+                [header.encode("utf-8") for header in headers],
+            )
+            handle.setopt(pycurl.WRITEFUNCTION, buffer.write)
+            handle.setopt(pycurl.HEADERFUNCTION, header_buffer.write)
+            handle.setopt(pycurl.TIMEOUT, timeout)
+            if _PYCURL_HTTP2:
+                handle.setopt(pycurl.HTTP_VERSION, pycurl.CURL_HTTP_VERSION_2TLS)
+            # Wait for an existing connection that can multiplex instead of
+            # opening a new one per transfer.
+            handle.setopt(pycurl.PIPEWAIT, 1)
+            handle.setopt(pycurl.FORBID_REUSE, 0)
+            handle.setopt(pycurl.TCP_KEEPALIVE, 1)
+            if cookie:
+                if "=" in cookie:
+                    handle.setopt(pycurl.COOKIE, cookie.encode("utf-8"))
+                else:
+                    handle.setopt(pycurl.COOKIEFILE, os.fsencode(cookie))
+        except BaseException:
+            self._release(handle)
+            raise
+        self._multi.add_handle(handle)
+        return handle, buffer, header_buffer
+
+    def post_many(
+        self,
+        requests: list[Tuple[str, list[str], str]],
+        cookie: Optional[str],
+        timeout: int,
+    ) -> list[Tuple[Optional[DocResponse], Optional[str]]]:
+        """POST all requests concurrently on pooled handles.
+
+        At most FETCH_CONCURRENCY transfers are attached at a time and the next
+        one starts as soon as one finishes, like curl --parallel. libcurl counts
+        time spent queued on the multi handle toward TIMEOUT, so attaching
+        everything up front would eat into the per-request timeout.
+
+        Args:
+            requests: List of (url, headers, body) tuples. headers are lines in
+                `name: value` form and body is the raw urlencoded request body.
+            cookie: Optional cookie string, or cookie file path like curl -b.
+            timeout: Transfer timeout in seconds, applied per request.
+
+        Returns:
+            A list of (response, error_message) in request order. If error occurs,
+            response is None.
+        """
+
+        results: list[Tuple[Optional[DocResponse], Optional[str]]] = [
+            (None, "curl failed: not run")
+        ] * len(requests)
+        pending = list(enumerate(requests))
+        pending.reverse()
+        attached: Dict[int, Tuple[int, pycurl.Curl, io.BytesIO, io.BytesIO]] = {}
+
+        def attach_pending() -> None:
+            while pending and len(attached) < FETCH_CONCURRENCY:
+                idx, request = pending.pop()
+                handle, buffer, header_buffer = self._attach(request, cookie, timeout)
+                attached[id(handle)] = (idx, handle, buffer, header_buffer)
+
+        def finish(handle: pycurl.Curl, error: Optional[str]) -> None:
+            idx, _handle, buffer, header_buffer = attached.pop(id(handle))
+            self._multi.remove_handle(handle)
+            self._release(handle)
+            if error:
+                results[idx] = (None, error)
+                return
+            status, last_modified = parse_response_head(header_buffer.getvalue())
+            results[idx] = (DocResponse(status, buffer.getvalue(), last_modified), None)
+
+        try:
+            attach_pending()
+            while attached:
+                self._perform()
+                while True:
+                    queued, succeeded, failed = self._multi.info_read()
+                    for handle in succeeded:
+                        finish(handle, None)
+                    for handle, errno, errmsg in failed:
+                        finish(handle, f"curl failed: {errmsg or errno}")
+                    if not queued:
+                        break
+                attach_pending()
+                if attached:
+                    # Honour libcurl's own timers so transfers progress promptly.
+                    wait_ms = self._multi.timeout()
+                    self._multi.select(wait_ms / 1000 if wait_ms >= 0 else 1.0)
+        finally:
+            for _idx, handle, _buffer, _header_buffer in attached.values():
+                self._multi.remove_handle(handle)
+                self._release(handle)
+
+        return results
+
+
+# HTTP_VERSION 2TLS is rejected when libcurl was built without nghttp2.
+_PYCURL_HTTP2 = pycurl is not None and bool(
+    pycurl.version_info()[4] & pycurl.VERSION_HTTP2
+)
+_CURL_POOL = _CurlPool() if pycurl is not None else None
+
+
+def parse_doc_payload(raw: bytes) -> Tuple[Optional[Dict[str, object]], Optional[str]]:
+    """Decode and validate a raw docFetch response body.
+
+    Args:
+        raw: Response body returned by docFetch.
+
+    Returns:
+        A tuple of (payload_dict, error_message). If error occurs, payload_dict is
+        None.
+    """
 
     try:
-        payload = json.loads(result.stdout)
+        payload = json_loads(raw)
     except json.JSONDecodeError as exc:
         return None, f"json decode failed: {exc}"
 
+    if not isinstance(payload, dict):
+        return None, "unexpected payload"
+
     if "statusCode" in payload and payload.get("statusCode") != 200:
         message = (
             payload.get("result", {}) or {}
@@ -134,10 +394,160 @@ def fetch_doc_payload(
     return payload, None
 
 
+def fetch_doc_responses_with_pycurl(
+    docs: Dict[str, str],
+    last_modified: Dict[str, str],
+    cookie: Optional[str],
+    timeout: int,
+) -> Dict[str, Tuple[Optional[DocResponse], Optional[str]]]:
+    """Fetch raw docFetch responses through the shared pycurl pool.
+
+    Args:
+        docs: Dict mapping doc_id to source_url.
+        last_modified: Dict mapping doc_id to its If-Modified-Since value.
+        cookie: Optional cookie string passed to curl.
+        timeout: Curl timeout in seconds, applied per document.
+
+    Returns:
+        A dict mapping doc_id to (response, error_message).
+    """
+
+    requests = [
+        (
+            doc_fetch_url(),
+            doc_fetch_headers(source_url, last_modified.get(doc_id)),
+            f"doc_id={doc_id}",
+        )
+        for doc_id, source_url in docs.items()
+    ]
+    return dict(zip(docs, _CURL_POOL.post_many(requests, cookie, timeout)))
+
+
+def fetch_doc_responses_with_curl_cli(
+    docs: Dict[str, str],
+    last_modified: Dict[str, str],
+    cookie: Optional[str],
+    timeout: int,
+) -> Dict[str, Tuple[Optional[DocResponse], Optional[str]]]:
+    """Fetch raw docFetch responses with a single curl process.
+
+    Transfers are chained with `--next` and run with `--parallel`, so curl
+    shares its keep-alive connections and TLS sessions to docFetch across
+    documents instead of paying a fresh handshake per file. Each response body
+    and header dump is written to its own temp file.
+
+    Args:
+        docs: Dict mapping doc_id to source_url.
+        last_modified: Dict mapping doc_id to its If-Modified-Since value.
+        cookie: Optional cookie string passed to curl.
+        timeout: Curl timeout in seconds, applied per document.
+
+    Returns:
+        A dict mapping doc_id to (response, error_message).
+    """
+
+    results: Dict[str, Tuple[Optional[DocResponse], Optional[str]]] = {}
+    with tempfile.TemporaryDirectory(prefix="wecom-doc-sync-") as tmp_dir:
+        # The --parallel progress meter ignores -s, so silence it explicitly.
+        cmd = [
+            "curl",
+            "--no-progress-meter",
+            "--parallel",
+            "--parallel-max",
+            str(FETCH_CONCURRENCY),
+        ]
+        outputs: list[Tuple[str, Path, Path]] = []
+        for idx, (doc_id, source_url) in enumerate(docs.items()):
+            output_path = Path(tmp_dir) / f"{idx}.json"
+            header_path = Path(tmp_dir) / f"{idx}.headers"
+            if idx:
+                cmd.append("--next")
+            cmd.extend(["-s", "--max-time", str(timeout)])
+            cmd.extend(["-o", str(output_path), "-D", str(header_path)])
+            cmd.extend(
+                doc_fetch_curl_args(doc_id, source_url, last_modified.get(doc_id))
+            )
+            if cookie:
+                cmd.extend(["-b", cookie])
+            outputs.append((doc_id, output_path, header_path))
+
+        result = subprocess.run(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        for doc_id, output_path, header_path in outputs:
+            # curl keeps going after a failed transfer, so judge each document
+            # by its own header dump rather than the overall exit code. Bodyless
+            # responses such as 304 leave no output file behind.
+            status, doc_last_modified = (
+                parse_response_head(header_path.read_bytes())
+                if header_path.exists()
+                else (0, None)
+            )
+            if not status:
+                error = decode_stderr(result.stderr) or result.returncode
+                results[doc_id] = (None, f"curl failed: {error}")
+                continue
+            body = output_path.read_bytes() if output_path.exists() else b""
+            results[doc_id] = (DocResponse(status, body, doc_last_modified), None)
+
+    return results
+
+
+def fetch_doc_payloads(
+    docs: list[Tuple[str, str]],
+    cookie: Optional[str],
+    timeout: int,
+    last_modified: Optional[Dict[str, str]] = None,
+) -> Dict[str, Tuple[Optional[Dict[str, object]], Optional[str], Optional[str]]]:
+    """Fetch raw payloads for several documents over a reused connection.
+
+    Uses the pooled pycurl handles when pycurl is installed, otherwise a single
+    batched curl CLI process.
+
+    Args:
+        docs: List of (doc_id, source_url) pairs. Duplicate doc_ids are fetched
+            once.
+        cookie: Optional cookie string passed to curl.
+        timeout: Curl timeout in seconds, applied per document.
+        last_modified: Optional dict mapping doc_id to the Last-Modified value
+            of its previous sync, sent as If-Modified-Since.
+
+    Returns:
+        A dict mapping doc_id to (payload_dict, error_message, last_modified).
+        payload_dict and error_message are both None when docFetch answered
+        304 Not Modified.
+    """
+
+    unique_docs: Dict[str, str] = {}
+    for doc_id, source_url in docs:
+        unique_docs.setdefault(doc_id, source_url)
+    if not unique_docs:
+        return {}
+
+    if _CURL_POOL is not None:
+        fetch_responses = fetch_doc_responses_with_pycurl
+    else:
+        fetch_responses = fetch_doc_responses_with_curl_cli
+    responses = fetch_responses(unique_docs, last_modified or {}, cookie, timeout)
+
+    results: Dict[str, Tuple[Optional[Dict[str, object]], Optional[str], Optional[str]]] = {}
+    for doc_id, (response, error) in responses.items():
+        if error:
+            results[doc_id] = (None, error, None)
+        elif response.status == 304:
+            results[doc_id] = (None, None, response.last_modified)
+        else:
+            payload, error = parse_doc_payload(response.body)
+            results[doc_id] = (payload, error, response.last_modified)
+    return results
+
+
 def fetch_doc_page_html(
     source_url: str,
     timeout: int,
-) -> Tuple[Optional[str], Optional[str]]:
+) -> Tuple[Optional[bytes], Optional[str]]:
     """Fetch the document page HTML for doc_id resolution.
 
     Args:
@@ -145,7 +555,9 @@ def fetch_doc_page_html(
         timeout: Curl timeout in seconds.
 
     Returns:
-        A tuple of (html_text, error_message). If error occurs, html_text is None.
+        A tuple of (html_bytes, error_message). The page is returned undecoded
+        so callers only decode the part they scan. If error occurs, html_bytes
+        is None.
     """
 
     cmd = [
@@ -158,9 +570,10 @@ def fetch_doc_page_html(
         "-H",
         f"user-agent: {USER_AGENT}",
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = subprocess.run(cmd, capture_output=True)
     if result.returncode != 0:
-        return None, f"page curl failed: {result.stderr.strip() or result.returncode}"
+        error = decode_stderr(result.stderr) or result.returncode
+        return None, f"page curl failed: {error}"
     if not result.stdout.strip():
         return None, "empty page html"
 
@@ -249,15 +662,20 @@ def resolve_real_doc_id_from_source_url(
     if error:
         return None, error
 
+    # The marker is ASCII, so locate it on the raw page and decode from there.
+    marker = "window.categories"
+    marker_idx = page_html.find(marker.encode("ascii"))
+    if marker_idx == -1:
+        return None, f"missing marker: {marker}"
     categories_json, error = extract_json_array_after_marker(
-        page_html,
-        "window.categories",
+        page_html[marker_idx:].decode("utf-8", "replace"),
+        marker,
     )
     if error:
         return None, error
 
     try:
-        categories = json.loads(categories_json)
+        categories = json_loads(categories_json)
     except json.JSONDecodeError as exc:
         return None, f"window.categories json decode failed: {exc}"
 
@@ -275,225 +693,292 @@ def resolve_real_doc_id_from_source_url(
     return None, f"doc_id not found for path_id={path_id}"
 
 
-def fetch_content_md(
-    doc_id: str,
-    source_url: str,
-    cookie: Optional[str],
-    timeout: int,
-) -> Tuple[Optional[str], Optional[str], Optional[str]]:
-    """Fetch content_md from the docFetch endpoint.
+def content_md_from_payload(
+    payload: Optional[Dict[str, object]],
+    error: Optional[str],
+) -> Tuple[Optional[str], Optional[str]]:
+    """Extract a non-empty content_md from a docFetch payload.
 
     Args:
-        doc_id: Document id to request.
-        source_url: Original document URL for the Referer header.
-        cookie: Optional cookie string passed to curl.
-        timeout: Curl timeout in seconds.
+        payload: Payload returned by fetch_doc_payloads.
+        error: Error returned alongside the payload.
 
     Returns:
-        A tuple of (content_md, error_message, resolved_doc_id). If error occurs,
-        content_md is None. When doc_id fallback succeeds, resolved_doc_id contains
-        the effective id used for the successful retry.
+        A tuple of (content_md, error_message). content_md is None when it is
+        missing or empty, which may be retried with the resolved doc_id.
     """
 
-    payload, error = fetch_doc_payload(doc_id, source_url, cookie, timeout)
     if error:
-        return None, error, None
+        return None, error
 
     data = payload.get("data")
     if not isinstance(data, dict):
-        return None, "missing data", None
+        return None, "missing data"
 
     content_md = data.get("content_md")
-    if isinstance(content_md, str) and content_md:
-        return content_md, None, doc_id
+    if not isinstance(content_md, str) or not content_md:
+        return None, "missing content_md"
+    return content_md, None
 
-    # Some documents expose a path id in source_url while docFetch expects the
-    # real doc_id embedded in the page metadata, so retry with the resolved id.
-    resolved_doc_id, resolve_error = resolve_real_doc_id_from_source_url(
-        source_url,
-        timeout,
-    )
-    if resolve_error or not resolved_doc_id or resolved_doc_id == doc_id:
-        return None, "missing content_md", None
 
-    retry_payload, retry_error = fetch_doc_payload(
-        resolved_doc_id,
-        source_url,
-        cookie,
-        timeout,
-    )
-    if retry_error:
-        return None, retry_error, resolved_doc_id
-
-    retry_data = retry_payload.get("data")
-    if not isinstance(retry_data, dict):
-        return None, "missing data after doc_id retry", resolved_doc_id
+class FetchResult(NamedTuple):
+    """Outcome of fetching content_md for one document."""
 
-    retry_content_md = retry_data.get("content_md")
-    if not isinstance(retry_content_md, str) or not retry_content_md:
-        return None, "missing content_md after doc_id retry", resolved_doc_id
+    content_md: Optional[str]
+    error: Optional[str]
+    resolved_doc_id: Optional[str]
+    last_modified: Optional[str] = None
+    not_modified: bool = False
 
-    return retry_content_md, None, resolved_doc_id
 
+def fetch_content_md(
+    docs: list[Tuple[str, str]],
+    cookie: Optional[str],
+    timeout: int,
+    last_modified: Optional[Dict[str, str]] = None,
+) -> Dict[str, FetchResult]:
+    """Fetch content_md from the docFetch endpoint for several documents.
 
-def normalize_heading_line(line: str) -> str:
-    """Normalize heading line spacing and extra hashes.
+    All documents are requested concurrently over shared connections. Documents
+    that come back without content_md are retried once with the real doc_id
+    resolved from their page metadata.
 
     Args:
-        line: Heading line starting with #.
+        docs: List of (doc_id, source_url) pairs.
+        cookie: Optional cookie string passed to curl.
+        timeout: Curl timeout in seconds.
+        last_modified: Optional dict mapping doc_id to the Last-Modified value
+            of its previous sync, used to make the first request conditional.
 
     Returns:
-        Normalized heading line.
+        A dict mapping doc_id to FetchResult. If error occurs, content_md is None.
+        When doc_id fallback succeeds, resolved_doc_id contains the effective id
+        used for the successful retry and last_modified is None. not_modified
+        is True when docFetch answered 304, in which case content_md is None as
+        well.
     """
 
-    match = HEADING_RE.match(line)
-    if not match:
-        return line
-
-    indent, hashes, rest = match.groups()
-    rest = rest.lstrip()
-    rest = rest.lstrip("#").lstrip()
-    if rest:
-        return f"{indent}{hashes} {rest}"
-    return f"{indent}{hashes}"
+    last_modified = last_modified or {}
+    payloads = fetch_doc_payloads(docs, cookie, timeout, last_modified)
+    results: Dict[str, FetchResult] = {}
+    retry_docs: Dict[str, str] = {}
 
+    for doc_id, source_url in docs:
+        if doc_id in results or doc_id in retry_docs:
+            continue
 
-def is_fence_line(line: str) -> bool:
-    """Return True if the line starts a fenced code block marker."""
-
-    return bool(FENCE_RE.match(line))
+        payload, error, doc_last_modified = payloads[doc_id]
+        if payload is None and error is None:
+            results[doc_id] = FetchResult(
+                None,
+                None,
+                doc_id,
+                doc_last_modified or last_modified.get(doc_id),
+                True,
+            )
+            continue
 
+        content_md, error = content_md_from_payload(payload, error)
+        if content_md:
+            results[doc_id] = FetchResult(content_md, None, doc_id, doc_last_modified)
+        elif error == "missing content_md":
+            retry_docs[doc_id] = source_url
+        else:
+            results[doc_id] = FetchResult(None, error, None)
 
-def is_heading_line(line: str) -> bool:
-    """Return True if the line is a markdown heading."""
+    if not retry_docs:
+        return results
 
-    return line.lstrip().startswith("#")
+    # Some documents expose a path id in source_url while docFetch expects the
+    # real doc_id embedded in the page metadata, so retry with the resolved id.
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as executor:
+        futures = {
+            doc_id: executor.submit(
+                resolve_real_doc_id_from_source_url,
+                source_url,
+                timeout,
+            )
+            for doc_id, source_url in retry_docs.items()
+        }
+    resolved = {doc_id: future.result() for doc_id, future in futures.items()}
+
+    retry_refs: list[Tuple[str, str]] = []
+    for doc_id, source_url in retry_docs.items():
+        resolved_doc_id, resolve_error = resolved[doc_id]
+        if resolve_error or not resolved_doc_id or resolved_doc_id == doc_id:
+            results[doc_id] = FetchResult(None, "missing content_md", None)
+        else:
+            retry_refs.append((resolved_doc_id, source_url))
 
+    retry_payloads = fetch_doc_payloads(retry_refs, cookie, timeout)
+    for doc_id in retry_docs:
+        if doc_id in results:
+            continue
+        resolved_doc_id = resolved[doc_id][0]
+        retry_payload, retry_error, _retry_last_modified = retry_payloads[resolved_doc_id]
+        retry_content_md, retry_error = content_md_from_payload(
+            retry_payload,
+            retry_error,
+        )
+        if retry_error in ("missing data", "missing content_md"):
+            retry_error += " after doc_id retry"
+        # Drop the retry's Last-Modified: the next run sends If-Modified-Since
+        # for the original doc_id, so a 304 there would hide changes to the
+        # resolved document.
+        results[doc_id] = FetchResult(retry_content_md, retry_error, resolved_doc_id)
 
-def is_list_item(line: str) -> bool:
-    """Return True if the line looks like a list item."""
+    return results
 
-    return bool(LIST_RE.match(line))
 
+def write_atomic(path: Path, data: bytes) -> None:
+    """Replace path with data atomically via a temp file in the same directory.
 
-def is_table_separator(line: str) -> bool:
-    """Return True if the line looks like a markdown table separator."""
+    Readers never observe a half-written file. An existing file's permission
+    bits are kept, and a symlink is written through to its target.
 
-    s = line.strip()
-    if not s or "|" not in s or "-" not in s:
-        return False
-    for ch in s:
-        if ch not in "|:- ":
-            return False
-    return True
+    Args:
+        path: Destination path.
+        data: Full file content.
+    """
 
+    # Replace the link target, not the link itself.
+    path = Path(os.path.realpath(path))
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent,
+        prefix=f".{path.name}.",
+        suffix=".tmp",
+        delete=False,
+    ) as tmp_file:
+        tmp_path = tmp_file.name
+        try:
+            tmp_file.write(data)
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_path)
+            raise
 
-def is_table_header(line: str, next_line: str) -> bool:
-    """Return True if line + next_line form a table header+separator."""
+    try:
+        if path.exists():
+            os.chmod(tmp_path, path.stat().st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
-    return "|" in line and is_table_separator(next_line)
 
+def _load_fetch_cache(doc_id: str, ttl: int) -> Optional[FetchResult]:
+    """Return the cached fetch of doc_id if it is younger than ttl seconds.
 
-def is_table_row(line: str) -> bool:
-    """Return True if the line looks like a table row."""
+    Entries are either a fetched content_md or a 304 Not Modified answer;
+    anything else, including an empty content_md, is treated as a miss.
+    """
 
-    return "|" in line
+    try:
+        entry = json_loads((FETCH_CACHE_DIR / f"{doc_id}.json").read_bytes())
+        if time.time() - entry["fetched_at"] >= ttl:
+            return None
+        content_md = entry["content_md"]
+        resolved_doc_id = entry["resolved_doc_id"]
+        last_modified = entry.get("last_modified")
+        not_modified = entry.get("not_modified") is True
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    if not isinstance(resolved_doc_id, str):
+        return None
+    if last_modified is not None and not isinstance(last_modified, str):
+        return None
+    if not_modified:
+        if content_md is not None:
+            return None
+    elif not isinstance(content_md, str) or not content_md:
+        return None
+    return FetchResult(content_md, None, resolved_doc_id, last_modified, not_modified)
+
+
+def _save_fetch_cache(doc_id: str, fetched: FetchResult) -> None:
+    """Persist a successful or not-modified fetch of doc_id; failures are ignored."""
+
+    entry = {
+        "content_md": fetched.content_md,
+        "fetched_at": time.time(),
+        "resolved_doc_id": fetched.resolved_doc_id,
+        "last_modified": fetched.last_modified,
+        "not_modified": fetched.not_modified,
+    }
+    try:
+        FETCH_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        write_atomic(
+            FETCH_CACHE_DIR / f"{doc_id}.json",
+            json.dumps(entry, ensure_ascii=False).encode("utf-8"),
+        )
+    except OSError:
+        pass
 
 
-def format_markdown(content: str) -> str:
-    """Format markdown using the SKILL.md rules.
+def fetch_content_md_cached(
+    docs: list[Tuple[str, str]],
+    cookie: Optional[str],
+    timeout: int,
+    last_modified: Optional[Dict[str, str]],
+    cache_ttl: int,
+) -> Dict[str, FetchResult]:
+    """Fetch content_md, reusing results cached within the last cache_ttl seconds.
 
     Args:
-        content: Raw markdown content.
+        docs: List of (doc_id, source_url) pairs.
+        cookie: Optional cookie string passed to curl.
+        timeout: Curl timeout in seconds.
+        last_modified: Optional dict mapping doc_id to its If-Modified-Since
+            value, used for documents that are not served from the cache.
+        cache_ttl: Maximum age in seconds of a reusable cache entry.
 
     Returns:
-        Formatted markdown content.
+        A dict mapping doc_id to FetchResult, as fetch_content_md. Network
+        results with content_md, and 304 answers, are written back to the cache.
     """
 
-    lines = content.splitlines()
-    out: list[str] = []
-    in_fence = False
-    in_table = False
-    pending_blank_after_heading = False
-    pending_blank_after_fence = False
-    prev_block: Optional[str] = None
-
-    for idx, raw_line in enumerate(lines):
-        line = raw_line.rstrip("\r")
-
-        if is_fence_line(line):
-            if not in_fence and out and out[-1].strip():
-                out.append("")
-            out.append(line.rstrip())
-            in_fence = not in_fence
-            if not in_fence:
-                pending_blank_after_fence = True
-            prev_block = "fence"
+    last_modified = last_modified or {}
+    results: Dict[str, FetchResult] = {}
+    for doc_id, _source_url in docs:
+        cached = _load_fetch_cache(doc_id, cache_ttl)
+        if cached is None:
             continue
-
-        if in_fence:
-            out.append(line)
+        # A cached 304 only holds while the doc still asks for that version;
+        # otherwise (e.g. a FORMAT_VERSION bump) the content must be fetched.
+        if cached.not_modified and cached.last_modified != last_modified.get(doc_id):
             continue
+        results[doc_id] = cached
 
-        if pending_blank_after_fence:
-            if line.strip():
-                out.append("")
-            pending_blank_after_fence = False
-
-        if in_table and not is_table_row(line):
-            if line.strip() and out and out[-1].strip():
-                out.append("")
-            in_table = False
-            prev_block = None
-
-        if is_heading_line(line):
-            normalized = normalize_heading_line(line).rstrip()
-            out.append(normalized)
-            pending_blank_after_heading = True
-            prev_block = "heading"
-            continue
+    missing = [(doc_id, url) for doc_id, url in docs if doc_id not in results]
+    fetched = fetch_content_md(missing, cookie, timeout, last_modified)
+    for doc_id, result in fetched.items():
+        if result.content_md or result.not_modified:
+            _save_fetch_cache(doc_id, result)
+    results.update(fetched)
+    return results
+
+
+class _DiffLine(str):
+    """A diff line that compares equal to another ignoring whitespace, like diff -w."""
+
+    def __new__(cls, line: str) -> "_DiffLine":
+        obj = super().__new__(cls, line)
+        obj.key = "".join(line.split())
+        return obj
 
-        if pending_blank_after_heading:
-            if line.strip():
-                out.append("")
-            pending_blank_after_heading = False
-
-        next_line = lines[idx + 1] if idx + 1 < len(lines) else ""
-        if not in_table and is_table_header(line, next_line):
-            if out and out[-1].strip():
-                out.append("")
-            in_table = True
-            prev_block = "table"
-
-        is_blank = not line.strip()
-        is_list = is_list_item(line)
-        if not is_blank and not in_table:
-            if is_list and prev_block == "paragraph":
-                if out and out[-1].strip():
-                    out.append("")
-            if (not is_list) and prev_block == "list":
-                if out and out[-1].strip():
-                    out.append("")
-
-        out.append(line.rstrip())
-
-        if not is_blank:
-            if in_table or is_table_row(line):
-                prev_block = "table"
-            elif is_list:
-                prev_block = "list"
-            else:
-                prev_block = "paragraph"
-
-    formatted = "\n".join(out).rstrip() + "\n"
-    return formatted
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _DiffLine) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
 
 
 def diff_important_changes(
     old_body: str,
     new_body: str,
     label: str,
-) -> Tuple[Optional[str], Optional[str]]:
+) -> Optional[str]:
     """Diff old vs new markdown, ignoring whitespace/blank lines.
 
     Args:
@@ -502,105 +987,161 @@ def diff_important_changes(
         label: Label for diff output.
 
     Returns:
-        A tuple of (diff_text, error_message). diff_text is None if no changes.
+        Unified diff text, or None if there are no important changes.
     """
 
-    with tempfile.NamedTemporaryFile("w+", delete=False) as old_file:
-        old_file.write(old_body)
-        old_path = old_file.name
-    with tempfile.NamedTemporaryFile("w+", delete=False) as new_file:
-        new_file.write(new_body)
-        new_path = new_file.name
+    old_lines = [_DiffLine(line.rstrip()) for line in old_body.splitlines() if line.strip()]
+    new_lines = [_DiffLine(line.rstrip()) for line in new_body.splitlines() if line.strip()]
+    if [line.key for line in old_lines] == [line.key for line in new_lines]:
+        return None
+
+    delta = difflib.unified_diff(
+        old_lines,
+        new_lines,
+        fromfile=f"{label} (old)",
+        tofile=f"{label} (new)",
+        lineterm="",
+    )
+    return "\n".join(delta)
 
-    cmd = [
-        "diff",
-        "-u",
-        "-w",
-        "-B",
-        "--label",
-        f"{label} (old)",
-        "--label",
-        f"{label} (new)",
-        old_path,
-        new_path,
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    os.unlink(old_path)
-    os.unlink(new_path)
 
-    if result.returncode == 0:
-        return None, None
-    if result.returncode == 1:
-        return result.stdout, None
-    return None, result.stderr.strip() or "diff failed"
+class FetchJob(NamedTuple):
+    """A markdown file whose frontmatter is ready for fetching."""
 
+    path: Path
+    doc_id: str
+    source_url: str
+    doc_name: str
+    fm_raw: str
+    body: str
+    content_sha: Optional[str]
+    last_modified: Optional[str]
+    format_version: Optional[str]
+    # File text exactly as stored, before newline normalization.
+    raw_text: str
 
-def update_markdown(
-    path: Path,
-    cookie: Optional[str],
-    dry_run: bool,
-    timeout: int,
-    show_changes: bool,
-) -> Tuple[bool, str, Optional[str]]:
-    """Update a single markdown file.
+
+def load_fetch_job(path: Path) -> Tuple[Optional[FetchJob], Optional[str]]:
+    """Read a markdown file and validate its frontmatter.
 
     Args:
         path: Path to markdown file.
-        cookie: Optional cookie string passed to curl.
-        dry_run: If True, do not write file.
-        timeout: Curl timeout in seconds.
-        show_changes: If True, print important changes diff.
 
     Returns:
-        A tuple of (success, message, change_output).
+        A tuple of (job, error_message). If error occurs, job is None.
     """
 
-    text = path.read_text(encoding="utf-8")
-    fm_raw, meta, _body = parse_frontmatter(text)
+    # Keep the exact stored text so update_markdown can detect no-op writes,
+    # but parse an LF-normalized copy so output never mixes line endings.
+    raw_text = path.read_bytes().decode("utf-8")
+    text = raw_text.replace("\r\n", "\n").replace("\r", "\n")
+    fm_raw, meta, body = parse_frontmatter(text)
 
     if not fm_raw or meta is None:
-        return False, "missing frontmatter", None
+        return None, "missing frontmatter"
 
     doc_id = meta.get("doc_id")
     source_url = meta.get("source_url")
     doc_name = meta.get("doc_name") or path.stem
 
     if not doc_id or not doc_id.isdigit():
-        return False, f"invalid doc_id for {doc_name}", None
+        return None, f"invalid doc_id for {doc_name}"
     if not source_url:
-        return False, f"missing source_url for {doc_name}", None
+        return None, f"missing source_url for {doc_name}"
 
-    # Fetch latest markdown content from WeCom docs.
-    content_md, error, effective_doc_id = fetch_content_md(
+    job = FetchJob(
+        path,
         doc_id,
         source_url,
-        cookie,
-        timeout,
+        doc_name,
+        fm_raw,
+        body,
+        meta.get("content_sha"),
+        meta.get("last_modified"),
+        meta.get("format_version"),
+        raw_text,
     )
-    if error:
-        return False, f"{doc_name}: {error}", None
+    return job, None
+
+
+def update_markdown(
+    job: FetchJob,
+    fetched: FetchResult,
+    dry_run: bool,
+    show_changes: bool,
+) -> Tuple[bool, str, Optional[str]]:
+    """Update a single markdown file with its fetched content.
+
+    Args:
+        job: Loaded markdown file.
+        fetched: The fetch_content_md result for job.doc_id.
+        dry_run: If True, do not write file.
+        show_changes: If True, print important changes diff.
+
+    Returns:
+        A tuple of (success, message, change_output).
+    """
+
+    path = job.path
+    doc_id = job.doc_id
+    doc_name = job.doc_name
+    content_md = fetched.content_md
+    effective_doc_id = fetched.resolved_doc_id
+    if fetched.error:
+        return False, f"{doc_name}: {fetched.error}", None
+
+    doc_id_note = ""
+    # A Last-Modified recorded for a doc needing the doc_id fallback would be
+    # sent for the original doc_id, so drop it rather than keep a stale value.
+    drop_last_modified = False
+    if effective_doc_id and effective_doc_id != doc_id:
+        doc_id_note = f" [doc_id {doc_id}->{effective_doc_id}]"
+        drop_last_modified = job.last_modified is not None
+
+    if fetched.not_modified:
+        return True, f"{doc_name}: not modified{doc_id_note}", None
+
+    # Skip diff, format and write when content_md matches the last synced one,
+    # unless a Last-Modified value still needs to be recorded or dropped, or the
+    # body was formatted by an older FORMAT_VERSION.
+    content_sha = hashlib.sha256(content_md.encode("utf-8")).hexdigest()
+    if (
+        content_sha == job.content_sha
+        and job.format_version == FORMAT_VERSION
+        and fetched.last_modified in (None, job.last_modified)
+        and not drop_last_modified
+    ):
+        return True, f"{doc_name}: unchanged (len={len(content_md)}){doc_id_note}", None
 
     change_output: Optional[str] = None
     if show_changes:
-        diff_text, diff_error = diff_important_changes(
-            _body, content_md, path.as_posix()
-        )
-        if diff_error:
-            change_output = f"[CHANGE] {path.name}: diff failed: {diff_error}"
-        elif diff_text:
+        diff_text = diff_important_changes(job.body, content_md, path.as_posix())
+        if diff_text:
             change_output = f"[CHANGE] {path.name}\n{diff_text.rstrip()}"
         else:
             change_output = f"[CHANGE] {path.name}: no important changes"
 
     formatted = format_markdown(content_md)
+    fm_raw = set_frontmatter_field(job.fm_raw, "content_sha", content_sha)
+    fm_raw = set_frontmatter_field(fm_raw, "format_version", FORMAT_VERSION)
+    if fetched.last_modified:
+        fm_raw = set_frontmatter_field(
+            fm_raw,
+            "last_modified",
+            f'"{fetched.last_modified}"',
+        )
+    elif drop_last_modified:
+        fm_raw = remove_frontmatter_field(fm_raw, "last_modified")
     new_text = fm_raw.rstrip("\n") + "\n\n" + formatted.rstrip() + "\n"
-    message = f"{doc_name}: {'dry-run' if dry_run else 'updated'} (len={len(content_md)})"
-    if effective_doc_id and effective_doc_id != doc_id:
-        message += f" [doc_id {doc_id}->{effective_doc_id}]"
     if dry_run:
-        return True, message, change_output
-
-    path.write_text(new_text, encoding="utf-8")
+        status = "dry-run"
+    elif new_text == job.raw_text:
+        status = "unchanged"
+    else:
+        status = "updated"
+    message = f"{doc_name}: {status} (len={len(content_md)}){doc_id_note}"
+    if status == "updated":
+        write_atomic(path, new_text.encode("utf-8"))
     return True, message, change_output
 
 
@@ -612,48 +1153,89 @@ def collect_targets(target_dir: Path, target_file: Optional[Path]) -> list[Path]
         target_file: Optional single file override.
 
     Returns:
-        List of markdown file paths.
+        List of markdown file paths, including symlinks to files, sorted by
+        name.
     """
 
     if target_file:
         return [target_file]
-    return sorted(target_dir.glob("*.md"))
+
+    # One scandir pass: DirEntry caches the file type, unlike Path.glob. Only
+    # symlinks need an extra stat to check that their target is a file.
+    with os.scandir(target_dir) as entries:
+        names = [
+            entry.name
+            for entry in entries
+            if entry.name.endswith(".md") and entry.is_file()
+        ]
+    names.sort()
+    return [target_dir / name for name in names]
 
 
 def git_diff_numstat(
     target: Path,
-) -> Tuple[list[Tuple[str, str, str]], int, int, Optional[str]]:
-    """Collect git diff numstat output for the target.
+    on_row: Callable[[str, str, str], None],
+) -> Tuple[int, int, int, Optional[str]]:
+    """Stream git diff numstat output for the markdown files under target.
+
+    Rows are handed to on_row as soon as git emits them, so the caller can
+    print them before git finishes.
 
     Args:
         target: File or directory to diff against HEAD.
+        on_row: Callback receiving (add_raw, del_raw, path) for each changed file.
 
     Returns:
-        A tuple of (rows, total_add, total_del, error_message). rows is a list of
-        (add_raw, del_raw, path). error_message is None on success.
+        A tuple of (file_count, total_add, total_del, error_message).
+        error_message is None on success.
     """
 
-    cmd = ["git", "diff", "--numstat", "HEAD", "--", str(target)]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        return [], 0, 0, result.stderr.strip() or "git diff failed"
-
-    rows: list[Tuple[str, str, str]] = []
+    pathspec = str(target / "*.md") if target.is_dir() else str(target)
+    cmd = ["git", "diff", "--numstat", "-z", "--no-renames", "HEAD", "--", pathspec]
+    # stderr goes to a temp file: a pipe nobody reads until stdout hits EOF
+    # would block git, and this loop with it, once warnings fill its buffer.
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+        with proc:
+            counts = _read_numstat_rows(proc.stdout, on_row)
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+
+    file_count, total_add, total_del = counts
+    if proc.returncode != 0:
+        error = decode_stderr(stderr) or "git diff failed"
+        return file_count, total_add, total_del, error
+    return file_count, total_add, total_del, None
+
+
+def _read_numstat_rows(
+    stream: io.BufferedReader,
+    on_row: Callable[[str, str, str], None],
+) -> Tuple[int, int, int]:
+    """Parse `git diff --numstat -z` records from stream as they arrive."""
+
+    file_count = 0
     total_add = 0
     total_del = 0
-
-    for line in result.stdout.splitlines():
-        parts = line.split("\t")
-        if len(parts) < 3:
-            continue
-        add_raw, del_raw, path = parts[0], parts[1], parts[2]
-        rows.append((add_raw, del_raw, path))
-        if add_raw.isdigit():
-            total_add += int(add_raw)
-        if del_raw.isdigit():
-            total_del += int(del_raw)
-
-    return rows, total_add, total_del, None
+    pending = b""
+
+    # With -z and --no-renames every record is "add\tdel\tpath\0". Only the
+    # path needs decoding; the counts are ASCII digits (or "-" for binaries).
+    for chunk in iter(lambda: stream.read1(65536), b""):
+        records = (pending + chunk).split(b"\0")
+        pending = records.pop()
+        for record in records:
+            parts = record.split(b"\t", 2)
+            if len(parts) < 3:
+                continue
+            add_raw, del_raw, path = parts
+            on_row(add_raw.decode("ascii"), del_raw.decode("ascii"), os.fsdecode(path))
+            file_count += 1
+            if add_raw.isdigit():
+                total_add += int(add_raw)
+            if del_raw.isdigit():
+                total_del += int(del_raw)
+    return file_count, total_add, total_del
 
 
 def build_arg_parser() -> argparse.ArgumentParser:
@@ -684,7 +1266,7 @@ def build_arg_parser() -> argparse.ArgumentParser:
         "--show-changes",
         dest="show_changes",
         action="store_true",
-        help="Print important changes (diff -u -w -B) before formatting",
+        help="Print important changes (unified diff ignoring whitespace) before formatting",
     )
     parser.add_argument(
         "--no-show-changes",
@@ -707,6 +1289,12 @@ def build_arg_parser() -> argparse.ArgumentParser:
         "--cookie",
         help="Optional cookie string for curl (-b).",
     )
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        default=0,
+        help="Reuse docFetch results cached within this many seconds (0 disables)",
+    )
     parser.set_defaults(show_changes=True)
     return parser
 
@@ -732,19 +1320,48 @@ def main() -> int:
         print(f"[ERROR] dir not found: {target_dir}", file=sys.stderr)
         return 2
 
-    # Collect targets and process sequentially for predictable logs.
+    # Collect targets; results are reported in target order for predictable logs.
     targets = collect_targets(target_dir, target_file)
     if not targets:
         print("[WARN] no markdown files found")
         return 0
 
+    # Read frontmatter serially, fetch all documents concurrently, then format
+    # and write serially in target order.
+    loaded = [(path, *load_fetch_job(path)) for path in targets]
+    jobs = [job for _path, job, _error in loaded if job]
+    fetch_docs = [(job.doc_id, job.source_url) for job in jobs]
+    # A 304 skips formatting, so only ask for one when the body is current.
+    fetch_last_modified = {
+        job.doc_id: job.last_modified
+        for job in jobs
+        if job.last_modified and job.format_version == FORMAT_VERSION
+    }
+    if args.cache_ttl > 0:
+        fetched = fetch_content_md_cached(
+            fetch_docs,
+            cookie,
+            args.timeout,
+            fetch_last_modified,
+            args.cache_ttl,
+        )
+    else:
+        fetched = fetch_content_md(
+            fetch_docs,
+            cookie,
+            args.timeout,
+            fetch_last_modified,
+        )
+
     ok_count = 0
-    for path in targets:
+    for path, job, error in loaded:
+        if error:
+            print(f"[SKIP] {path.name}: {error}")
+            continue
         success, message, change_output = update_markdown(
-            path,
-            cookie,
+            job,
+            fetched[job.doc_id],
             args.dry_run,
-            args.timeout,
             args.show_changes,
         )
         if success:
@@ -755,22 +1372,25 @@ def main() -> int:
         if change_output:
             print(change_output)
 
-    print(f"[DONE] {ok_count}/{len(targets)} updated")
+    print(f"[DONE] {ok_count}/{len(targets)} synced")
 
     if args.show_diff:
         # Show git diff summary for the updated target scope.
         diff_target = target_file or target_dir
-        rows, total_add, total_del, error = git_diff_numstat(diff_target)
+        print(f"[DIFF] target={diff_target}")
+        file_count, total_add, total_del, error = git_diff_numstat(
+            diff_target,
+            lambda add_raw, del_raw, path: print(
+                f"[DIFF] +{add_raw} -{del_raw} {path}", flush=True
+            ),
+        )
         if error:
             print(f"[WARN] diff failed: {error}")
             return 0
-        print(f"[DIFF] target={diff_target}")
-        if not rows:
+        if not file_count:
             print("[DIFF] no changes")
             return 0
-        for add_raw, del_raw, path in rows:
-            print(f"[DIFF] +{add_raw} -{del_raw} {path}")
-        print(f"[DIFF] total +{total_add} -{total_del} files={len(rows)}")
+        print(f"[DIFF] total +{total_add} -{total_del} files={file_count}")
     return 0
 
 